@@ -22,6 +22,12 @@ POOL_ID="<pool id>"
 SUBNET_ID="<subnet id>"
 RESOURCE_GROUP="<resource group name>"
 
+Optionally, to pack several tasks onto each node:
+VM_SIZE="<vm size>" (defaults to STANDARD_d4d_v5, with 4 cores)
+TASK_SLOTS_PER_NODE="<tasks run at once on each node>" (defaults to 1)
+Submit the job with `azure/job.py --cores_per_task` set to the node's cores
+divided by the task slots, so each task's chains get their share of the node.
+
 If running in CI, all of the above environment variables should be set in the repo
 secrets.
 """
@@ -31,6 +37,8 @@ import os
 from azure.identity import DefaultAzureCredential
 from azure.mgmt.batch import BatchManagementClient
 
+DEFAULT_VM_SIZE = "STANDARD_d4d_v5"
+
 AUTO_SCALE_FORMULA = """
 // In this example, the pool size
 // is adjusted based on the number of tasks in the queue.
@@ -41,8 +49,9 @@ $samples = $ActiveTasks.GetSamplePercent(TimeInterval_Minute * 5);
 // If we have fewer than 70 percent data points, we use the last sample point, otherwise we use the maximum of last sample point and the history average.
 $tasks = $samples < 70 ? max(0, $ActiveTasks.GetSample(1)) :
 max( $ActiveTasks.GetSample(1), avg($ActiveTasks.GetSample(TimeInterval_Minute * 5)));
-// If number of pending tasks is not 0, set targetVM to pending tasks, otherwise half of current dedicated.
-$targetVMs = $tasks > 0 ? $tasks : max(0, $TargetDedicatedNodes / 2);
+// If number of pending tasks is not 0, set targetVM to enough nodes to run them all at once given the
+// task slots on each node, otherwise half of current dedicated.
+$targetVMs = $tasks > 0 ? ceil($tasks / {task_slots_per_node}) : max(0, $TargetDedicatedNodes / 2);
 // The pool size is capped at 100, if target VM value is more than that, set it to 100.
 cappedPoolSize = 100;
 $TargetDedicatedNodes = max(0, min($targetVMs, cappedPoolSize));
@@ -51,7 +60,25 @@ $NodeDeallocationOption = taskcompletion;
 """
 
 
+def auto_scale_formula(task_slots_per_node: int) -> str:
+    """
+    The pool's autoscale formula, sized for the tasks each node runs at once
+
+    Arguments
+    ----------
+    task_slots_per_node: int
+        The number of tasks each node runs at the same time
+    """
+    return AUTO_SCALE_FORMULA.replace(
+        "{task_slots_per_node}", str(task_slots_per_node)
+    )
+
+
 def main() -> None:
+    task_slots_per_node = int(os.environ.get("TASK_SLOTS_PER_NODE", "1"))
+    if task_slots_per_node < 1:
+        raise ValueError("TASK_SLOTS_PER_NODE must be at least 1")
+
     # Create the BatchManagementClient
     batch_mgmt_client = BatchManagementClient(
         credential=DefaultAzureCredential(),
@@ -70,10 +97,13 @@ def main() -> None:
             },
         },
         "properties": {
-            "vmSize": "STANDARD_d4d_v5",
+            "vmSize": os.environ.get("VM_SIZE", DEFAULT_VM_SIZE),
             "interNodeCommunication": "Disabled",
-            "taskSlotsPerNode": 1,
-            "taskSchedulingPolicy": {"nodeFillType": "Spread"},
+            "taskSlotsPerNode": task_slots_per_node,
+            # Fill each node's slots before starting another node when packing
+            "taskSchedulingPolicy": {
+                "nodeFillType": "Pack" if task_slots_per_node > 1 else "Spread"
+            },
             "deploymentConfiguration": {
                 "virtualMachineConfiguration": {
                     "imageReference": {
@@ -109,7 +139,7 @@ def main() -> None:
             "scaleSettings": {
                 "autoScale": {
                     "evaluationInterval": "PT5M",
-                    "formula": AUTO_SCALE_FORMULA,
+                    "formula": auto_scale_formula(task_slots_per_node),
                 }
             },
             "resizeOperationStatus": {
@@ -1,6 +1,8 @@
 # /// script
 # requires-python = ">=3.13"
 # dependencies = [
+#     "azure-identity==1.21.0",
+#     "azure-storage-blob==12.25.1",
 #     "cfa-config-generator",
 #     "typer",
 # ]
@@ -14,8 +16,12 @@ from datetime import date, datetime, timedelta, timezone
 from typing import Annotated
 
 import typer
+from azure.identity import DefaultAzureCredential
+from azure.storage.blob import BlobServiceClient
 from cfa_config_generator.utils.epinow2.driver_functions import generate_config
 
+from task_configs import write_manifest
+
 
 def main(
     state: Annotated[
@@ -60,6 +66,14 @@ def main(
             show_default=True,
         ),
     ] = 0.94,
+    config_container: Annotated[
+        str,
+        typer.Option(help="Storage container the configs are uploaded to"),
+    ] = "rt-epinow2-config",
+    blob_account: Annotated[
+        str,
+        typer.Option(help="Storage account holding the config container"),
+    ] = "cfaazurebatchprd",
 ):
     """
     Generate and upload config files for the epinow2 pipeline.
@@ -96,6 +110,15 @@ def main(
         facility_active_proportion=facility_active_proportion,
     )
 
+    # Record the generated configs so submitters can find them with one read
+    # instead of listing the config container.
+    blob_service_client = BlobServiceClient(
+        f"https://{blob_account}.blob.core.windows.net", DefaultAzureCredential()
+    )
+    write_manifest(
+        blob_service_client.get_container_client(container=config_container), job_id
+    )
+
 
 if __name__ == "__main__":
     typer.run(main)
@@ -11,6 +11,7 @@ import datetime
 import os
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from msrest.authentication import BasicTokenAuthentication
 
@@ -19,8 +20,151 @@ from azure.batch import BatchServiceClient
 from azure.identity import DefaultAzureCredential
 from azure.storage.blob import BlobServiceClient
 
+from task_configs import (
+    find_task_configs,
+    pack_task_configs,
+    pipeline_expression,
+)
 
-def main(image_name: str, config_container: str, pool_id: str, job_id: str):
+# The Batch service rejects `add_collection` requests with more than 100 tasks
+MAX_TASKS_PER_COLLECTION = 100
+
+
+def add_task_collection(
+    batch_client: BatchServiceClient,
+    batch_job_id: str,
+    tasks: list[batchmodels.TaskAddParameter],
+    max_retries: int = 3,
+) -> tuple[int, list[batchmodels.TaskAddResult]]:
+    """
+    Add one collection of tasks, retrying the tasks the service failed to add
+
+    Arguments
+    ----------
+    batch_client: BatchServiceClient
+        An authenticated Batch client
+    batch_job_id: str
+        The Batch job to add the tasks to
+    tasks: list[batchmodels.TaskAddParameter]
+        At most `MAX_TASKS_PER_COLLECTION` tasks to add
+    max_retries: int
+        How many times to resubmit tasks that failed with a server error
+
+    Returns
+    ----------
+    A tuple of the number of tasks added and the results for any tasks that
+    could not be added.
+    """
+    pending = {task.id: task for task in tasks}
+    failed: list[batchmodels.TaskAddResult] = []
+    n_added = 0
+    attempt = 0
+    while pending:
+        attempt += 1
+        result = batch_client.task.add_collection(
+            batch_job_id, value=list(pending.values())
+        )
+        retryable: dict[str, batchmodels.TaskAddParameter] = {}
+        for task_result in result.value:
+            if task_result.status == batchmodels.TaskAddStatus.success:
+                n_added += 1
+            elif (
+                task_result.status == batchmodels.TaskAddStatus.server_error
+                and attempt <= max_retries
+            ):
+                # Server errors are transient, so try the task again
+                retryable[task_result.task_id] = pending[task_result.task_id]
+            else:
+                failed.append(task_result)
+        pending = retryable
+        if pending:
+            print(f"Retrying {len(pending)} task(s) after server error")
+            time.sleep(2**attempt)
+
+    return n_added, failed
+
+
+def submit_tasks(
+    batch_client: BatchServiceClient,
+    batch_job_id: str,
+    tasks: list[batchmodels.TaskAddParameter],
+    max_workers: int = 8,
+) -> list[batchmodels.TaskAddResult]:
+    """
+    Submit tasks in bulk, sending collections concurrently
+
+    Arguments
+    ----------
+    batch_client: BatchServiceClient
+        An authenticated Batch client
+    batch_job_id: str
+        The Batch job to add the tasks to
+    tasks: list[batchmodels.TaskAddParameter]
+        The tasks to add
+    max_workers: int
+        The number of collections to submit at the same time
+
+    Returns
+    ----------
+    The results for any tasks that could not be added.
+    """
+    start = time.perf_counter()
+    chunks = [
+        tasks[i : i + MAX_TASKS_PER_COLLECTION]
+        for i in range(0, len(tasks), MAX_TASKS_PER_COLLECTION)
+    ]
+
+    n_added = 0
+    failed: list[batchmodels.TaskAddResult] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(add_task_collection, batch_client, batch_job_id, chunk)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            chunk_added, chunk_failed = future.result()
+            n_added += chunk_added
+            failed.extend(chunk_failed)
+
+    elapsed = datetime.timedelta(seconds=time.perf_counter() - start)
+    print(
+        f"Submitted {n_added}/{len(tasks)} tasks in {len(chunks)} collection(s); "
+        f"{len(failed)} failed. Submission took {elapsed}"
+    )
+    for task_result in failed:
+        message = task_result.error.message.value if task_result.error else ""
+        print(f"  Failed to add task {task_result.task_id}: {message}")
+
+    return failed
+
+
+def container_run_options(cores_per_task: int | None = None) -> str:
+    """
+    The `docker run` options for each task's container
+
+    Arguments
+    ----------
+    cores_per_task: int | None
+        The number of cores to limit each task's container to, or None to let
+        it use the whole node. The limit sets the container's CPU quota, which
+        the pipeline reads to decide how many chains to run in parallel when
+        the config's `sampler_opts` has `"cores": "auto"`.
+    """
+    options = "--rm --workdir /"
+    if cores_per_task is not None:
+        options += f" --cpus={cores_per_task}"
+    return options
+
+
+def main(
+    image_name: str,
+    config_container: str,
+    pool_id: str,
+    job_id: str,
+    max_workers: int = 8,
+    configs_per_task: int = 1,
+    cores_per_task: int | None = None,
+):
     """
     Submit a job
 
@@ -34,6 +178,14 @@ def main(image_name: str, config_container: str, pool_id: str, job_id: str):
         The name of the pool to use for the job
     job_id: str
         The name of the job to use for the job.
+    max_workers: int
+        The number of task collections to submit concurrently
+    configs_per_task: int
+        The number of configs to run in each task's R process
+    cores_per_task: int | None
+        The number of cores each task may use. Set it to the pool's cores per
+        node divided by its `taskSlotsPerNode` to pack several tasks onto each
+        node. If None, each task may use every core on its node.
     """
     blob_account = os.environ["BLOB_ACCOUNT"]
     blob_url = f"https://{blob_account}.blob.core.windows.net"
@@ -75,9 +227,7 @@ def main(image_name: str, config_container: str, pool_id: str, job_id: str):
         container=config_container
     )
 
-    task_configs: list[str] = [
-        b.name for b in container_client.list_blobs() if job_id in b.name
-    ]
+    task_configs: list[str] = find_task_configs(container_client, job_id)
     if len(task_configs) > 0:
         print(f"Creating {len(task_configs)} tasks in job {job_id} on pool {pool_id}")
     elif len(task_configs) == 0:
@@ -86,7 +236,8 @@ def main(image_name: str, config_container: str, pool_id: str, job_id: str):
     ###########
     # Set up tasks on job
     task_container_settings = batchmodels.TaskContainerSettings(
-        image_name=image_name, container_run_options="--rm --workdir /"
+        image_name=image_name,
+        container_run_options=container_run_options(cores_per_task),
     )
     task_env_settings = [
         batchmodels.EnvironmentSetting(
@@ -108,17 +259,28 @@ def main(image_name: str, config_container: str, pool_id: str, job_id: str):
         )
     )
 
-    for config_path in task_configs:
-        command = f"Rscript -e \"CFAEpiNow2Pipeline::orchestrate_pipeline('{config_path}', config_container = '{config_container}', input_dir = '/mnt/input', output_dir = '/mnt/output')\""
-        task = batchmodels.TaskAddParameter(
-            id=str(uuid.uuid4()),
-            command_line=command,
-            container_settings=task_container_settings,
-            environment_settings=task_env_settings,
-            user_identity=user_identity,
+    tasks: list[batchmodels.TaskAddParameter] = []
+    for config_paths in pack_task_configs(task_configs, configs_per_task):
+        expression = pipeline_expression(
+            config_paths,
+            config_container,
+            input_dir="/mnt/input",
+            output_dir="/mnt/output",
+        )
+        command = f'Rscript -e "{expression}"'
+        tasks.append(
+            batchmodels.TaskAddParameter(
+                id=str(uuid.uuid4()),
+                command_line=command,
+                container_settings=task_container_settings,
+                environment_settings=task_env_settings,
+                user_identity=user_identity,
+            )
         )
 
-        batch_client.task.add(batch_job_id, task)
+    failed = submit_tasks(batch_client, batch_job_id, tasks, max_workers=max_workers)
+    if failed:
+        raise RuntimeError(f"Failed to add {len(failed)} task(s) to job {job_id}")
 
 
 if __name__ == "__main__":
@@ -151,6 +313,28 @@ if __name__ == "__main__":
         help="The name of the job to use for the job. Defaults to pool_id",
         default=None,
     )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        help="The number of task collections to submit concurrently",
+        default=8,
+    )
+    parser.add_argument(
+        "--configs_per_task",
+        type=int,
+        help="The number of configs to run in each task's R process",
+        default=1,
+    )
+    parser.add_argument(
+        "--cores_per_task",
+        type=int,
+        help=(
+            "The number of cores each task may use. Match it to the pool's "
+            "cores per node divided by its task slots per node. "
+            "Defaults to every core on the node"
+        ),
+        default=None,
+    )
 
     # Parse the args
     args = parser.parse_args()
@@ -159,10 +343,16 @@ if __name__ == "__main__":
     pool_id: str = args.pool_id
     # Use pool_id as job_id if not specified
     job_id: str = args.job_id or pool_id
+    max_workers: int = args.max_workers
+    configs_per_task: int = args.configs_per_task
+    cores_per_task: int | None = args.cores_per_task
 
     main(
         image_name=image_name,
         config_container=config_container,
         pool_id=pool_id,
         job_id=job_id,
+        max_workers=max_workers,
+        configs_per_task=configs_per_task,
+        cores_per_task=cores_per_task,
     )
@@ -26,13 +26,61 @@ ContainerAppSystemLogs_CL
 | project TimeGenerated, Sys_Logs = Log_s, ExecutionName_s, Type_s, Console_Logs = Log_s1, Duration = TimeGenerated - TimeGenerated1
 """
 
+import copy
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from azure.identity import DefaultAzureCredential
 from azure.mgmt.appcontainers import ContainerAppsAPIClient
+from azure.mgmt.appcontainers.models import JobExecutionTemplate
 from azure.mgmt.resource.subscriptions import SubscriptionClient
 from azure.storage.blob import BlobServiceClient
 
+from task_configs import (
+    find_task_configs,
+    pack_task_configs,
+    pipeline_expression,
+)
+
+
+def build_template(
+    base_template: JobExecutionTemplate,
+    image_name: str,
+    config_paths: list[str],
+    config_container: str,
+) -> JobExecutionTemplate:
+    """
+    Build an execution template for some configs without modifying the base
 
-def main(image_name: str, config_container: str, job_id: str):
+    Arguments
+    ----------
+    base_template: JobExecutionTemplate
+        The template downloaded from the existing Container App Job
+    image_name: str
+        The name of the container image (and tag) to use for the Rt pipeline run
+    config_paths: list[str]
+        The paths of the config blobs to run in this execution
+    config_container: str
+        The name of the storage container where config files are located
+    """
+    template = copy.deepcopy(base_template)
+    container = template.containers[0]
+    container.image = image_name
+    container.command = [
+        "Rscript",
+        "-e",
+        pipeline_expression(config_paths, config_container),
+    ]
+    return template
+
+
+def main(
+    image_name: str,
+    config_container: str,
+    job_id: str,
+    max_workers: int = 16,
+    configs_per_task: int = 1,
+):
     """
     Submit a job
 
@@ -44,6 +92,10 @@ def main(image_name: str, config_container: str, job_id: str):
         The name of the storage container where config files are located
     job_id: str
         The name of the job to use for the Rt pipeline run.
+    max_workers: int
+        The number of executions to start concurrently
+    configs_per_task: int
+        The number of configs to run in each execution's R process
     """
 
     job_name = "cfa-epinow2-pipeline"
@@ -57,9 +109,7 @@ def main(image_name: str, config_container: str, job_id: str):
         container=config_container
     )
 
-    task_configs: list[str] = [
-        b.name for b in container_client.list_blobs() if job_id in b.name
-    ]
+    task_configs: list[str] = find_task_configs(container_client, job_id)
     if len(task_configs) > 0:
         print(f"Creating {len(task_configs)} tasks in job {job_id}")
     elif len(task_configs) == 0:
@@ -78,28 +128,48 @@ def main(image_name: str, config_container: str, job_id: str):
     job_template = client.jobs.get(
         resource_group_name=resource_group, job_name=job_name
     ).template
-    container = job_template.containers[0]
-
-    container.image = image_name
 
-    for i, config_path in enumerate(task_configs):
-        # Update the command for this config
-        container.command = [
-            "Rscript",
-            "-e",
-            f"CFAEpiNow2Pipeline::orchestrate_pipeline('{config_path}', config_container = '{config_container}')",
-        ]
-
-        # Start job
+    def start_execution(config_paths: list[str]) -> str:
+        # Each execution gets its own copy of the template, so concurrent
+        # starts never see another config's command
+        template = build_template(
+            job_template, image_name, config_paths, config_container
+        )
         job_execution = client.jobs.begin_start(
-            resource_group_name=resource_group, job_name=job_name, template=job_template
+            resource_group_name=resource_group, job_name=job_name, template=template
         ).result()
-
-        state_config = config_path.split("/").pop()
-        job_execution_id = job_execution.id.split("/").pop()
-        print(
-            f"Started Container App Job #{i+1}/{len(task_configs)} for {state_config} with execution ID: {job_execution_id}"
-        )
+        return job_execution.id.split("/").pop()
+
+    packed_configs = pack_task_configs(task_configs, configs_per_task)
+    start = time.perf_counter()
+    execution_ids: dict[int, str] = {}
+    failed: dict[int, Exception] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(start_execution, config_paths): i
+            for i, config_paths in enumerate(packed_configs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            state_config = ", ".join(
+                config_path.split("/").pop() for config_path in packed_configs[i]
+            )
+            try:
+                execution_ids[i] = future.result()
+            except Exception as err:
+                failed[i] = err
+                print(f"Failed to start Container App Job for {state_config}: {err}")
+                continue
+            print(
+                f"Started Container App Job #{len(execution_ids)}/{len(packed_configs)} for {state_config} with execution ID: {execution_ids[i]}"
+            )
+
+    print(
+        f"Started {len(execution_ids)}/{len(packed_configs)} executions in "
+        f"{time.perf_counter() - start:.1f}s; {len(failed)} failed"
+    )
+    if failed:
+        raise RuntimeError(f"Failed to start {len(failed)} execution(s) for {job_id}")
 
 
 if __name__ == "__main__":
@@ -126,15 +196,31 @@ if __name__ == "__main__":
         help="The name of the job to use for the Rt pipeline run",
         default=None,
     )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        help="The number of executions to start concurrently",
+        default=16,
+    )
+    parser.add_argument(
+        "--configs_per_task",
+        type=int,
+        help="The number of configs to run in each execution's R process",
+        default=1,
+    )
 
     # Parse the args
     args = parser.parse_args()
     image_name: str = args.image_name
     config_container: str = args.config_container
     job_id: str = args.job_id
+    max_workers: int = args.max_workers
+    configs_per_task: int = args.configs_per_task
 
     main(
         image_name=image_name,
         config_container=config_container,
         job_id=job_id,
+        max_workers=max_workers,
+        configs_per_task=configs_per_task,
     )
@@ -0,0 +1,166 @@
+"""
+Shared helpers for finding the task configs that belong to a job.
+
+Configs for a job are stored under a `<job_id>/` folder in the config
+container. When the configs are generated, a manifest listing every config
+path is written to `<job_id>/_manifest.json`, so submitters can read the full
+task list with a single GET. If the manifest is missing (e.g., for jobs
+generated before manifests existed) we fall back to listing only the blobs
+under the job's prefix, rather than the whole container.
+"""
+
+import json
+
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import ContainerClient
+
+MANIFEST_NAME = "_manifest.json"
+
+
+def job_prefix(job_id: str) -> str:
+    """The folder in the config container holding a job's configs"""
+    return f"{job_id}/"
+
+
+def manifest_path(job_id: str) -> str:
+    """The path of the manifest blob for a job"""
+    return f"{job_prefix(job_id)}{MANIFEST_NAME}"
+
+
+def list_task_configs(container_client: ContainerClient, job_id: str) -> list[str]:
+    """
+    List the config blobs under the job's prefix
+
+    Arguments
+    ----------
+    container_client: ContainerClient
+        A client for the config container
+    job_id: str
+        The job to find configs for
+    """
+    return sorted(
+        b.name
+        for b in container_client.list_blobs(name_starts_with=job_prefix(job_id))
+        if b.name.endswith(".json") and b.name != manifest_path(job_id)
+    )
+
+
+def read_manifest(container_client: ContainerClient, job_id: str) -> list[str] | None:
+    """
+    Read the list of config paths from the job's manifest, if there is one
+
+    Arguments
+    ----------
+    container_client: ContainerClient
+        A client for the config container
+    job_id: str
+        The job to find configs for
+    """
+    try:
+        raw = container_client.download_blob(manifest_path(job_id)).readall()
+    except ResourceNotFoundError:
+        return None
+    return json.loads(raw)["configs"]
+
+
+def write_manifest(container_client: ContainerClient, job_id: str) -> list[str]:
+    """
+    Write a manifest of the job's configs next to the configs themselves
+
+    Arguments
+    ----------
+    container_client: ContainerClient
+        A client for the config container
+    job_id: str
+        The job to write the manifest for
+
+    Returns
+    ----------
+    The config paths recorded in the manifest.
+    """
+    task_configs = list_task_configs(container_client, job_id)
+    container_client.upload_blob(
+        manifest_path(job_id),
+        json.dumps({"job_id": job_id, "configs": task_configs}, indent=2),
+        overwrite=True,
+    )
+    print(f"Wrote manifest of {len(task_configs)} configs to {manifest_path(job_id)}")
+    return task_configs
+
+
+def find_task_configs(container_client: ContainerClient, job_id: str) -> list[str]:
+    """
+    Find the config blobs for a job, preferring the manifest over listing
+
+    Arguments
+    ----------
+    container_client: ContainerClient
+        A client for the config container
+    job_id: str
+        The job to find configs for
+    """
+    task_configs = read_manifest(container_client, job_id)
+    if task_configs is None:
+        print(f"No manifest found for {job_id}. Listing configs by prefix")
+        task_configs = list_task_configs(container_client, job_id)
+    return task_configs
+
+
+def pack_task_configs(
+    task_configs: list[str], configs_per_task: int
+) -> list[list[str]]:
+    """
+    Group configs so that each task runs several of them in one R process
+
+    Arguments
+    ----------
+    task_configs: list[str]
+        The config paths for the job
+    configs_per_task: int
+        The maximum number of configs to run in each task
+    """
+    if configs_per_task < 1:
+        raise ValueError("configs_per_task must be at least 1")
+    return [
+        task_configs[i : i + configs_per_task]
+        for i in range(0, len(task_configs), configs_per_task)
+    ]
+
+
+def pipeline_expression(
+    config_paths: list[str],
+    config_container: str,
+    input_dir: str | None = None,
+    output_dir: str | None = None,
+) -> str:
+    """
+    Build the R expression that runs the pipeline on one or more configs
+
+    A single config runs through `orchestrate_pipeline()`; several configs run
+    through `orchestrate_pipelines()` so they share one R process.
+
+    Arguments
+    ----------
+    config_paths: list[str]
+        The config paths to run
+    config_container: str
+        The name of the storage container where config files are located
+    input_dir: str | None
+        The directory to download inputs to. Uses the R default if None
+    output_dir: str | None
+        The directory to write outputs to. Uses the R default if None
+    """
+    args = [f"config_container = '{config_container}'"]
+    if input_dir is not None:
+        args.append(f"input_dir = '{input_dir}'")
+    if output_dir is not None:
+        args.append(f"output_dir = '{output_dir}'")
+
+    if len(config_paths) == 1:
+        function = "orchestrate_pipeline"
+        configs = f"'{config_paths[0]}'"
+    else:
+        function = "orchestrate_pipelines"
+        configs = "c(" + ", ".join(f"'{path}'" for path in config_paths) + ")"
+
+    return f"CFAEpiNow2Pipeline::{function}({configs}, {', '.join(args)})"